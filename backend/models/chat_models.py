@@ -6,6 +6,25 @@ from datetime import datetime
 class ChatRequest(BaseModel):
     message: str
     user_id: Optional[str] = None
+    # Optional scope: only documents matching every given filter are used
+    document_ids: Optional[List[str]] = None
+    content_types: Optional[List[str]] = None
+    uploaded_after: Optional[datetime] = None
+    uploaded_before: Optional[datetime] = None
+    filename_glob: Optional[str] = None
+
+    def has_scope(self) -> bool:
+        """Check if any document filter is set"""
+        return any(
+            value is not None
+            for value in (
+                self.document_ids,
+                self.content_types,
+                self.uploaded_after,
+                self.uploaded_before,
+                self.filename_glob,
+            )
+        )
 
 class ChatResponse(BaseModel):
     response: str
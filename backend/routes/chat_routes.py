@@ -3,21 +3,39 @@ from pydantic import BaseModel
 from typing import List, Optional
 
 from services.openai_service import OpenAIService
-from services.document_service import DocumentService
+from services.document_service import get_document_service
 from models.chat_models import ChatRequest, ChatResponse
 
 router = APIRouter(prefix="/api/v1", tags=["chat"])
 
-# Initialize services
+# Initialize services (documents are shared with the document routes so uploads are visible to chat)
 openai_service = OpenAIService()
-document_service = DocumentService()
+document_service = get_document_service()
 
 @router.post("/chat", response_model=ChatResponse)
 async def chat_with_documents(request: ChatRequest):
     """Chat with uploaded documents using OpenAI"""
     try:
-        # Get all documents for context
-        documents = await document_service.get_all_documents()
+        scoped = request.has_scope()
+        
+        if scoped:
+            # Only use documents matching the requested scope
+            documents = await document_service.find_documents(
+                document_ids=request.document_ids,
+                content_types=request.content_types,
+                uploaded_after=request.uploaded_after,
+                uploaded_before=request.uploaded_before,
+                filename_glob=request.filename_glob
+            )
+            
+            if not documents:
+                return ChatResponse(
+                    response="No documents match the requested filters. Please adjust the filters or upload matching documents.",
+                    sources=[]
+                )
+        else:
+            # Get all documents for context
+            documents = await document_service.get_all_documents()
         
         if not documents:
             return ChatResponse(
@@ -28,7 +46,8 @@ async def chat_with_documents(request: ChatRequest):
         # Use OpenAI service to get response
         response = await openai_service.chat_with_documents(
             message=request.message,
-            documents=documents
+            documents=documents,
+            scoped=scoped
         )
         
         return response
@@ -36,3 +55,8 @@ async def chat_with_documents(request: ChatRequest):
     except Exception as e:
         print(f"Chat error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Chat failed: {str(e)}")
+
+@router.get("/chat/upstream-metrics")
+async def get_upstream_metrics():
+    """Get retry, hedge and circuit breaker metrics for OpenAI calls"""
+    return openai_service.get_upstream_metrics()
@@ -6,13 +6,13 @@ import uuid
 from datetime import datetime
 from typing import List
 
-from services.document_service import DocumentService
+from services.document_service import get_document_service
 from models.chat_models import DocumentInfo, DocumentResponse
 
 router = APIRouter(prefix="/api/v1", tags=["documents"])
 
 # Initialize services
-document_service = DocumentService()
+document_service = get_document_service()
 
 @router.post("/documents/upload", response_model=List[DocumentResponse])
 async def upload_documents(files: List[UploadFile] = File(...)):
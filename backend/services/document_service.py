@@ -2,8 +2,9 @@
 import aiofiles
 import json
 import os
-import asyncio
-from typing import List, Optional
+import bisect
+import fnmatch
+from typing import Dict, List, Optional, Set, Tuple
 from pathlib import Path
 import PyPDF2
 import docx
@@ -21,21 +22,22 @@ class DocumentService:
         # In-memory storage (in production, use a proper database)
         self.documents: List[DocumentInfo] = []
 
-        loop = asyncio.get_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            loop.run_until_complete(self._load_documents())
-        except Exception as e:
-            print(f"Error loading documents: {str(e)}")
-            self.documents = []
+        # Indexes over document metadata, kept in sync with self.documents
+        self._by_id: Dict[str, DocumentInfo] = {}
+        self._by_content_type: Dict[str, Set[str]] = {}
+        self._by_extension: Dict[str, Set[str]] = {}
+        self._by_upload_date: List[Tuple[datetime, str]] = []
+
+        # Load synchronously: the service may be created while uvicorn's event loop is running
+        self._load_documents()
+        self._rebuild_indexes()
 
-    async def _load_documents(self):
+    def _load_documents(self):
         """Load documents from storage"""
         try:
             if self.documents_file.exists():
-                async with aiofiles.open(self.documents_file, 'r') as f:
-                    content = await f.read()
-                    data = json.loads(content)
+                with open(self.documents_file, 'r') as f:
+                    data = json.load(f)
                     self.documents = [
                         DocumentInfo(**doc) for doc in data
                     ]
@@ -43,6 +45,40 @@ class DocumentService:
             print(f"Error loading documents: {str(e)}")
             self.documents = []
 
+    def _rebuild_indexes(self):
+        """Rebuild all metadata indexes from the document list"""
+        self._by_id = {}
+        self._by_content_type = {}
+        self._by_extension = {}
+        self._by_upload_date = []
+        for doc in self.documents:
+            self._index_document(doc)
+
+    def _index_document(self, doc: DocumentInfo):
+        """Add a document to the metadata indexes"""
+        self._by_id[doc.id] = doc
+        self._by_content_type.setdefault(doc.content_type, set()).add(doc.id)
+        extension = Path(doc.filename).suffix.lower()
+        self._by_extension.setdefault(extension, set()).add(doc.id)
+        bisect.insort(self._by_upload_date, (self._naive(doc.upload_date), doc.id))
+
+    def _unindex_document(self, doc: DocumentInfo):
+        """Remove a document from the metadata indexes"""
+        self._by_id.pop(doc.id, None)
+        self._by_content_type.get(doc.content_type, set()).discard(doc.id)
+        self._by_extension.get(Path(doc.filename).suffix.lower(), set()).discard(doc.id)
+        key = (self._naive(doc.upload_date), doc.id)
+        i = bisect.bisect_left(self._by_upload_date, key)
+        if i < len(self._by_upload_date) and self._by_upload_date[i] == key:
+            self._by_upload_date.pop(i)
+
+    @staticmethod
+    def _naive(value: datetime) -> datetime:
+        """Convert timezone-aware datetimes to naive local time for comparison"""
+        if value.tzinfo is not None:
+            return value.astimezone().replace(tzinfo=None)
+        return value
+
     async def _save_documents(self):
         """Save documents to storage"""
         try:
@@ -113,14 +149,12 @@ class DocumentService:
     async def store_document(self, document: DocumentInfo):
         """Store document information"""
         self.documents.append(document)
+        self._index_document(document)
         await self._save_documents()
 
     async def get_document(self, document_id: str) -> Optional[DocumentInfo]:
         """Get a specific document by ID"""
-        for doc in self.documents:
-            if doc.id == document_id:
-                return doc
-        return None
+        return self._by_id.get(document_id)
 
     async def get_all_documents(self) -> List[DocumentInfo]:
         """Get all documents"""
@@ -139,6 +173,7 @@ class DocumentService:
                 
                 # Remove from list
                 self.documents.pop(i)
+                self._unindex_document(doc)
                 await self._save_documents()
                 return True
         return False
@@ -154,3 +189,68 @@ class DocumentService:
                 results.append(doc)
         
         return results
+
+    async def find_documents(
+        self,
+        document_ids: Optional[List[str]] = None,
+        content_types: Optional[List[str]] = None,
+        uploaded_after: Optional[datetime] = None,
+        uploaded_before: Optional[datetime] = None,
+        filename_glob: Optional[str] = None,
+    ) -> List[DocumentInfo]:
+        """Find documents matching all given filters using the metadata indexes"""
+        candidates: List[Set[str]] = []
+
+        if document_ids is not None:
+            candidates.append({doc_id for doc_id in document_ids if doc_id in self._by_id})
+
+        if content_types is not None:
+            ids: Set[str] = set()
+            for content_type in content_types:
+                ids |= self._by_content_type.get(content_type, set())
+            candidates.append(ids)
+
+        if uploaded_after is not None or uploaded_before is not None:
+            lo = 0
+            hi = len(self._by_upload_date)
+            if uploaded_after is not None:
+                lo = bisect.bisect_left(self._by_upload_date, (self._naive(uploaded_after),))
+            if uploaded_before is not None:
+                hi = bisect.bisect_right(
+                    self._by_upload_date, (self._naive(uploaded_before), chr(0x10FFFF))
+                )
+            candidates.append({doc_id for _, doc_id in self._by_upload_date[lo:hi]})
+
+        pattern = filename_glob.lower() if filename_glob is not None else None
+        if pattern is not None:
+            # Narrow by extension when the glob ends in a literal one, e.g. "*.pdf".
+            # Bracket classes can span the dot ("*[.]pdf"), so skip those patterns.
+            extension = Path(pattern).suffix
+            if extension and not any(c in pattern for c in "[]") and not any(c in extension for c in "*?"):
+                candidates.append(set(self._by_extension.get(extension, set())))
+
+        if candidates:
+            candidates.sort(key=len)
+            ids = candidates[0].intersection(*candidates[1:])
+        else:
+            ids = set(self._by_id)
+
+        results = [self._by_id[doc_id] for doc_id in ids]
+        if pattern is not None:
+            results = [
+                doc for doc in results
+                if fnmatch.fnmatchcase(doc.filename.lower(), pattern)
+            ]
+
+        return sorted(results, key=lambda doc: self._naive(doc.upload_date))
+
+
+_document_service: Optional[DocumentService] = None
+
+
+def get_document_service() -> DocumentService:
+    """Get the DocumentService shared by all routes"""
+    global _document_service
+    if _document_service is None:
+        _document_service = DocumentService()
+    return _document_service
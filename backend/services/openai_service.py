@@ -9,12 +9,36 @@ import uuid
 import os
 from pathlib import Path
 from models.chat_models import DocumentInfo, ChatResponse, BatchJob
+from services.resilience import ResilientCaller, CircuitBreaker, CircuitOpenError
 
 from dotenv import load_dotenv
 
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+# Resilience settings for upstream OpenAI calls
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "30"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "3"))
+OPENAI_HEDGING = os.getenv("OPENAI_HEDGING", "true").lower() in ("1", "true", "yes")
+OPENAI_HEDGE_BUDGET = float(os.getenv("OPENAI_HEDGE_BUDGET", "0.05"))
+OPENAI_BREAKER_THRESHOLD = int(os.getenv("OPENAI_BREAKER_THRESHOLD", "5"))
+OPENAI_BREAKER_RESET = float(os.getenv("OPENAI_BREAKER_RESET", "30"))
+
+# Errors worth retrying: timeouts, connection problems, rate limits and 5xx
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+# Errors that mean the request was not processed, so even non-idempotent calls can retry
+SAFE_RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+)
+
+# Scoped chats with at most this many documents skip the batch API
+SCOPED_REALTIME_MAX_DOCUMENTS = 5
+
 
 class OpenAIService:
     def __init__(self):
@@ -27,7 +51,22 @@ class OpenAIService:
             )
         # Initialize the OpenAI client with just the API key    
         openai.api_key = self.api_key        
-        self.client = openai.OpenAI()
+        # Async client so timeouts and hedging cancel the request; retries are handled by the resilience layer
+        self.client = openai.AsyncOpenAI(timeout=OPENAI_TIMEOUT, max_retries=0)
+        
+        # Timeouts, retries, hedging and circuit breaking for all client calls
+        self.resilience = ResilientCaller(
+            timeout=OPENAI_TIMEOUT,
+            max_retries=OPENAI_MAX_RETRIES,
+            hedging=OPENAI_HEDGING,
+            hedge_budget=OPENAI_HEDGE_BUDGET,
+            retry_on=RETRYABLE_ERRORS,
+            safe_retry_on=SAFE_RETRYABLE_ERRORS,
+            breaker=CircuitBreaker(
+                failure_threshold=OPENAI_BREAKER_THRESHOLD,
+                reset_timeout=OPENAI_BREAKER_RESET
+            )
+        )
         
         # Directory for batch processing files
         self.batch_dir = Path("backend/batch_files")
@@ -36,7 +75,7 @@ class OpenAIService:
         # In-memory storage for batch jobs (in production, use a database)
         self.batch_jobs: Dict[str, BatchJob] = {}
 
-    async def chat_with_documents(self, message: str, documents: List[DocumentInfo]) -> ChatResponse:
+    async def chat_with_documents(self, message: str, documents: List[DocumentInfo], scoped: bool = False) -> ChatResponse:
         """
         Chat with documents using OpenAI's batch API for processing multiple documents
         """
@@ -44,7 +83,9 @@ class OpenAIService:
             # For real-time chat, we'll use the regular API
             # For batch processing of multiple documents, we'll use batch API
             
-            if len(documents) > 1:  # Use batch API for many documents
+            if scoped and len(documents) <= SCOPED_REALTIME_MAX_DOCUMENTS:  # Small scope fits one prompt
+                return await self._realtime_chat_with_documents(message, documents)
+            elif len(documents) > 1:  # Use batch API for many documents
                 return await self._batch_chat_with_documents(message, documents)
             else:  # Use regular API for few documents
                 return await self._realtime_chat_with_documents(message, documents)
@@ -78,7 +119,10 @@ class OpenAIService:
             Please answer based on the document content provided above."""
             
             # Call OpenAI API
-            response = self.client.chat.completions.create(
+            response = await self.resilience.call(
+                self.client.chat.completions.create,
+                operation="chat.completions.create",
+                hedge=True,
                 model="gpt-4-turbo-preview",
                 messages=[
                     {"role": "system", "content": system_prompt},
@@ -96,6 +140,12 @@ class OpenAIService:
                 sources=sources
             )
             
+        except CircuitOpenError as e:
+            print(f"Real-time chat error: {str(e)}")
+            return ChatResponse(
+                response="The AI service is temporarily unavailable. Please try again in a minute.",
+                sources=[]
+            )
         except Exception as e:
             print(f"Real-time chat error: {str(e)}")
             return ChatResponse(
@@ -139,15 +189,24 @@ class OpenAIService:
                 for request in batch_requests:
                     await f.write(json.dumps(request) + '\n')
             
-            # Upload file to OpenAI
-            with open(input_file_path, 'rb') as f:
-                file_response = self.client.files.create(
-                    file=f,
-                    purpose='batch'
-                )
+            # Upload file to OpenAI (as bytes, so retries can resend it)
+            async with aiofiles.open(input_file_path, 'rb') as f:
+                file_content = await f.read()
+            # Uploads and batch creation are not idempotent, so they are never hedged
+            # and only retried when the request was rejected before processing
+            file_response = await self.resilience.call(
+                self.client.files.create,
+                operation="files.create",
+                idempotent=False,
+                file=(input_file_path.name, file_content),
+                purpose='batch'
+            )
             
             # Create batch job
-            batch_response = self.client.batches.create(
+            batch_response = await self.resilience.call(
+                self.client.batches.create,
+                operation="batches.create",
+                idempotent=False,
                 input_file_id=file_response.id,
                 endpoint="/v1/chat/completions",
                 completion_window="24h"
@@ -185,7 +244,9 @@ class OpenAIService:
             batch_job = self.batch_jobs[job_id]
             
             # Check with OpenAI
-            batch_response = self.client.batches.retrieve(job_id)
+            batch_response = await self.resilience.call(
+                self.client.batches.retrieve, job_id, operation="batches.retrieve", hedge=True
+            )
             
             if batch_response.status == "completed":
                 # Process results
@@ -214,7 +275,9 @@ class OpenAIService:
         """Process batch results from OpenAI"""
         try:
             # Download the results file
-            file_response = self.client.files.content(output_file_id)
+            file_response = await self.resilience.call(
+                self.client.files.content, output_file_id, operation="files.content", hedge=True
+            )
             
             results = []
             for line in file_response.text.strip().split('\n'):
@@ -239,3 +302,7 @@ class OpenAIService:
             }
             for job in self.batch_jobs.values()
         ]
+
+    def get_upstream_metrics(self) -> Dict[str, Any]:
+        """Get retry, hedge and circuit breaker metrics for OpenAI calls"""
+        return self.resilience.metrics()
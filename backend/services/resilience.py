@@ -0,0 +1,296 @@
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple, Type
+
+
+class CircuitOpenError(Exception):
+    """Raised when the circuit breaker rejects a call without trying it"""
+
+
+class CircuitBreaker:
+    """
+    Fail fast while an upstream service is degraded.
+
+    The breaker opens after `failure_threshold` consecutive failures. Once
+    `reset_timeout` seconds have passed it lets a single trial call through
+    (half-open); a success closes it again, a failure re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.times_opened = 0
+        self._trial_in_flight = False
+
+    def allow_request(self) -> bool:
+        """Check if a call may go upstream right now"""
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.state = self.HALF_OPEN
+            self._trial_in_flight = False
+        # Half-open: only one trial call at a time
+        if self._trial_in_flight:
+            return False
+        self._trial_in_flight = True
+        return True
+
+    def record_success(self):
+        """Record a successful upstream call"""
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        """Record a failed upstream call"""
+        self.consecutive_failures += 1
+        self._trial_in_flight = False
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.times_opened += 1
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def release_trial(self):
+        """Free the half-open trial slot without counting the call as a success or failure"""
+        self._trial_in_flight = False
+
+
+class ResilientCaller:
+    """
+    Await upstream calls with a timeout, jittered exponential retries,
+    optional hedging and a circuit breaker.
+
+    Calls must be coroutine functions (e.g. AsyncOpenAI methods) so a timeout
+    or a losing hedge cancels the request itself. Hedging starts a second
+    identical attempt once the first has run longer than the p95 latency of
+    that operation, within a budget of `hedge_budget` of all calls.
+    """
+
+    def __init__(
+        self,
+        timeout: float = 30.0,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        hedging: bool = True,
+        hedge_quantile: float = 0.95,
+        hedge_min_samples: int = 20,
+        hedge_budget: float = 0.05,
+        retry_on: Tuple[Type[BaseException], ...] = (),
+        safe_retry_on: Tuple[Type[BaseException], ...] = (),
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedging = hedging
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_budget = hedge_budget
+        self.retry_on = (asyncio.TimeoutError,) + tuple(retry_on)
+        # Errors known to mean the request was not processed, safe to retry for any call
+        self.safe_retry_on = tuple(safe_retry_on)
+        self.breaker = breaker or CircuitBreaker()
+
+        # Recent latencies per operation, used for the hedge delay
+        self._latencies: Dict[str, Deque[float]] = {}
+        # Operations that have been called with hedging enabled
+        self._hedged_operations: Set[str] = set()
+        self._counters: Dict[str, int] = {
+            "calls": 0,
+            "successes": 0,
+            "failures": 0,
+            "attempts": 0,
+            "retries": 0,
+            "timeouts": 0,
+            "hedges": 0,
+            "hedge_wins": 0,
+            "short_circuited": 0,
+        }
+
+    async def call(
+        self,
+        fn: Callable[..., Awaitable[Any]],
+        *args,
+        operation: Optional[str] = None,
+        hedge: bool = False,
+        idempotent: bool = True,
+        **kwargs
+    ) -> Any:
+        """
+        Await `fn(*args, **kwargs)` with retries, hedging and the circuit breaker.
+
+        Calls that are not idempotent are never hedged, and are only retried on
+        `safe_retry_on` errors: after a timeout or 5xx the first request may
+        already have been processed upstream.
+        """
+        operation = operation or getattr(fn, "__qualname__", repr(fn))
+        hedge = hedge and idempotent and self.hedging
+        if hedge:
+            self._hedged_operations.add(operation)
+        self._counters["calls"] += 1
+        attempt = 0
+
+        while True:
+            if not self.breaker.allow_request():
+                self._counters["short_circuited"] += 1
+                raise CircuitOpenError("Upstream circuit is open; failing fast")
+
+            try:
+                result = await self._attempt(operation, fn, args, kwargs, hedge)
+            except self.retry_on as e:
+                self.breaker.record_failure()
+                if attempt >= self.max_retries or not (idempotent or isinstance(e, self.safe_retry_on)):
+                    self._counters["failures"] += 1
+                    raise
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                print(f"Upstream call {operation} failed ({type(e).__name__}), retrying in {delay:.2f}s")
+                self._counters["retries"] += 1
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            except Exception:
+                # Upstream answered (e.g. a bad request or 404): says nothing about its health
+                self.breaker.release_trial()
+                self._counters["failures"] += 1
+                raise
+            except BaseException:
+                # Cancelled: free the trial slot so a half-open breaker can still recover
+                self.breaker.release_trial()
+                raise
+
+            self.breaker.record_success()
+            self._counters["successes"] += 1
+            return result
+
+    async def _attempt(self, operation: str, fn: Callable[..., Awaitable[Any]], args: tuple, kwargs: dict, hedge: bool) -> Any:
+        """Run a single (possibly hedged) attempt and record its latency"""
+        delay = self._hedge_delay(operation) if hedge else None
+        start = time.monotonic()
+        try:
+            if delay is None:
+                result = await self._timed_call(fn, args, kwargs)
+            else:
+                result = await self._hedged_call(fn, args, kwargs, delay)
+        except asyncio.TimeoutError:
+            # Record timeouts at the timeout so slow upstreams raise the hedge delay
+            self._record_latency(operation, self.timeout)
+            raise
+        # Measured from the first request, so hedge wins don't pull the delay down
+        self._record_latency(operation, time.monotonic() - start)
+        return result
+
+    async def _hedged_call(self, fn: Callable[..., Awaitable[Any]], args: tuple, kwargs: dict, delay: float) -> Any:
+        """Start a backup attempt if the first one is slower than `delay`, return the first success"""
+        primary = asyncio.ensure_future(self._timed_call(fn, args, kwargs))
+        tasks: List[asyncio.Future] = [primary]
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done or self._counters["hedges"] >= self.hedge_budget * self._counters["calls"]:
+                return await primary
+
+            self._counters["hedges"] += 1
+            backup = asyncio.ensure_future(self._timed_call(fn, args, kwargs))
+            tasks.append(backup)
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is backup:
+                            self._counters["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def _timed_call(self, fn: Callable[..., Awaitable[Any]], args: tuple, kwargs: dict) -> Any:
+        """Await `fn`, cancelling it after the call timeout"""
+        self._counters["attempts"] += 1
+        task = asyncio.ensure_future(fn(*args, **kwargs))
+        try:
+            done, _ = await asyncio.wait({task}, timeout=self.timeout)
+        except BaseException:
+            self._abandon(task)
+            raise
+        if not done:
+            # Unlike wait_for, don't wait for the cancellation to land:
+            # anyio 3 can swallow it and let the request run to completion
+            self._counters["timeouts"] += 1
+            self._abandon(task)
+            raise asyncio.TimeoutError()
+        return task.result()
+
+    @staticmethod
+    def _abandon(task: asyncio.Future, interval: float = 0.05):
+        """Cancel a task without waiting for it, re-cancelling until it stops"""
+        loop = asyncio.get_running_loop()
+
+        def cancel():
+            if not task.done():
+                task.cancel()
+                loop.call_later(interval, cancel)
+
+        # Retrieve the outcome so an abandoned failure isn't logged as never retrieved
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        cancel()
+
+    def _record_latency(self, operation: str, seconds: float):
+        self._latencies.setdefault(operation, deque(maxlen=500)).append(seconds)
+
+    def _hedge_delay(self, operation: str) -> Optional[float]:
+        """Get the hedge delay for an operation, if it has enough samples"""
+        samples = self._latencies.get(operation, ())
+        if len(samples) < self.hedge_min_samples:
+            return None
+        return self._quantile(samples, self.hedge_quantile)
+
+    @staticmethod
+    def _quantile(samples, q: float) -> Optional[float]:
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def metrics(self) -> Dict[str, Any]:
+        """Get retry, hedge and circuit breaker metrics"""
+        def to_ms(seconds: Optional[float]) -> Optional[float]:
+            return round(seconds * 1000, 1) if seconds is not None else None
+
+        return {
+            **self._counters,
+            "operations": {
+                operation: {
+                    "samples": len(samples),
+                    "latency_p50_ms": to_ms(self._quantile(samples, 0.5)),
+                    "latency_p95_ms": to_ms(self._quantile(samples, 0.95)),
+                    "hedge_delay_ms": to_ms(
+                        self._hedge_delay(operation) if operation in self._hedged_operations else None
+                    ),
+                }
+                for operation, samples in self._latencies.items()
+            },
+            "circuit": {
+                "state": self.breaker.state,
+                "consecutive_failures": self.breaker.consecutive_failures,
+                "times_opened": self.breaker.times_opened,
+            },
+        }
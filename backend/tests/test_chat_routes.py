@@ -0,0 +1,104 @@
+import asyncio
+import importlib
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import List
+
+import pytest
+
+import services.openai_service as openai_service_module
+from models.chat_models import ChatRequest, DocumentInfo
+from services.document_service import DocumentService
+from services.openai_service import SCOPED_REALTIME_MAX_DOCUMENTS, OpenAIService
+
+NO_MATCH = "No documents match the requested filters"
+
+
+class StubClient:
+    """Stands in for AsyncOpenAI and records which endpoints were called"""
+
+    def __init__(self):
+        self.calls: List[str] = []
+        completion = SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="Stub answer"))])
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._endpoint("chat.completions.create", completion)))
+        self.files = SimpleNamespace(create=self._endpoint("files.create", SimpleNamespace(id="file-1")))
+        self.batches = SimpleNamespace(create=self._endpoint("batches.create", SimpleNamespace(id="batch-1")))
+
+    def _endpoint(self, name: str, response):
+        async def call(*args, **kwargs):
+            self.calls.append(name)
+            return response
+        return call
+
+
+def make_document(i: int) -> DocumentInfo:
+    return DocumentInfo(
+        id=f"doc-{i}",
+        filename=f"{'contract' if i < 3 else 'report'}_{i}.pdf",
+        original_filename=f"doc_{i}.pdf",
+        file_path=f"uploads/doc-{i}.pdf",
+        content_type="application/pdf",
+        size=1,
+        upload_date=datetime(2026, 1, 1) + timedelta(days=i),
+        text_content=f"Text of document {i}"
+    )
+
+
+@pytest.fixture
+def chat(tmp_path, monkeypatch):
+    """The chat route with 8 stored documents and a stubbed OpenAI client"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("OPENAI_API_KEY", "fake")
+    monkeypatch.setattr(openai_service_module, "OPENAI_API_KEY", "fake")
+    chat_routes = importlib.import_module("routes.chat_routes")
+
+    document_service = DocumentService()
+    for i in range(8):
+        asyncio.run(document_service.store_document(make_document(i)))
+    openai_service = OpenAIService()
+    openai_service.client = StubClient()
+    monkeypatch.setattr(chat_routes, "document_service", document_service)
+    monkeypatch.setattr(chat_routes, "openai_service", openai_service)
+
+    def send(**fields):
+        return asyncio.run(chat_routes.chat_with_documents(ChatRequest(message="What is this?", **fields)))
+
+    send.calls = openai_service.client.calls
+    return send
+
+
+def test_empty_scope_is_a_scope():
+    assert ChatRequest(message="hi", document_ids=[]).has_scope()
+    assert not ChatRequest(message="hi").has_scope()
+
+
+def test_small_scope_uses_realtime_api(chat):
+    response = chat(filename_glob="contract_*")
+    assert chat.calls == ["chat.completions.create"]
+    assert response.response == "Stub answer"
+    assert response.sources == ["contract_0.pdf", "contract_1.pdf", "contract_2.pdf"]
+
+
+def test_scope_at_realtime_limit_uses_realtime_api(chat):
+    response = chat(document_ids=[f"doc-{i}" for i in range(SCOPED_REALTIME_MAX_DOCUMENTS)])
+    assert chat.calls == ["chat.completions.create"]
+    assert len(response.sources) == SCOPED_REALTIME_MAX_DOCUMENTS
+
+
+def test_large_scope_uses_batch_api(chat):
+    response = chat(content_types=["application/pdf"])
+    assert chat.calls == ["files.create", "batches.create"]
+    assert len(response.sources) == 8
+
+
+@pytest.mark.parametrize("scope", [
+    {"document_ids": ["missing"]},
+    {"document_ids": []},
+    {"filename_glob": "*.docx"},
+    {"uploaded_after": datetime(2027, 1, 1)},
+])
+def test_no_matches_skips_upstream(chat, scope):
+    response = chat(**scope)
+    assert response.response.startswith(NO_MATCH)
+    assert response.sources == []
+    assert chat.calls == []
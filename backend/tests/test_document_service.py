@@ -0,0 +1,101 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from models.chat_models import DocumentInfo
+from services.document_service import DocumentService
+
+
+def make_document(doc_id: str, filename: str, content_type: str, upload_date: datetime) -> DocumentInfo:
+    return DocumentInfo(
+        id=doc_id,
+        filename=filename,
+        original_filename=filename,
+        file_path=f"uploads/{doc_id}",
+        content_type=content_type,
+        size=1,
+        upload_date=upload_date,
+        text_content="text"
+    )
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    service = DocumentService()
+    documents = [
+        make_document("a", "contract.pdf", "application/pdf", datetime(2026, 1, 1)),
+        make_document("b", "notes.txt", "text/plain", datetime(2026, 1, 2)),
+        make_document("c", "Report.PDF", "application/pdf", datetime(2026, 1, 3)),
+        make_document("d", "contract_v2.docx", "application/msword", datetime(2026, 1, 4)),
+    ]
+    for doc in documents:
+        asyncio.run(service.store_document(doc))
+    return service
+
+
+def find(service: DocumentService, **filters):
+    return [doc.id for doc in asyncio.run(service.find_documents(**filters))]
+
+
+def test_no_filters_returns_all_by_upload_date(service):
+    assert find(service) == ["a", "b", "c", "d"]
+
+
+def test_document_ids_ignore_unknown(service):
+    assert find(service, document_ids=["c", "missing", "a"]) == ["a", "c"]
+
+
+def test_content_types(service):
+    assert find(service, content_types=["application/pdf", "text/plain"]) == ["a", "b", "c"]
+    assert find(service, content_types=["image/png"]) == []
+
+
+def test_upload_date_bounds_are_inclusive(service):
+    assert find(service, uploaded_after=datetime(2026, 1, 2), uploaded_before=datetime(2026, 1, 3)) == ["b", "c"]
+    assert find(service, uploaded_after=datetime(2026, 1, 4)) == ["d"]
+    assert find(service, uploaded_before=datetime(2026, 1, 1)) == ["a"]
+
+
+def test_aware_bounds_compare_with_naive_dates(service):
+    after = datetime(2026, 1, 3).astimezone()
+    assert find(service, uploaded_after=after) == ["c", "d"]
+    # Same instant expressed in UTC
+    assert find(service, uploaded_after=after.astimezone(timezone.utc)) == ["c", "d"]
+
+
+def test_aware_upload_dates_are_indexed(service):
+    asyncio.run(service.store_document(
+        make_document("e", "late.txt", "text/plain", datetime(2026, 1, 5).astimezone(timezone.utc))
+    ))
+    assert find(service, uploaded_after=datetime(2026, 1, 5) - timedelta(seconds=1)) == ["e"]
+
+
+def test_filename_glob_is_case_insensitive(service):
+    assert find(service, filename_glob="*.pdf") == ["a", "c"]
+    assert find(service, filename_glob="CONTRACT*") == ["a", "d"]
+
+
+def test_filename_glob_with_bracket_class_spanning_dot(service):
+    assert find(service, filename_glob="*[.]pdf") == ["a", "c"]
+    assert find(service, filename_glob="*.[pt][dx][ft]") == ["a", "b", "c"]
+
+
+def test_filters_combine(service):
+    assert find(service, filename_glob="contract*", content_types=["application/pdf"]) == ["a"]
+    assert find(service, document_ids=["a", "b"], uploaded_after=datetime(2026, 1, 2)) == ["b"]
+
+
+def test_delete_keeps_indexes_in_sync(service):
+    assert asyncio.run(service.delete_document("c"))
+    assert find(service, content_types=["application/pdf"]) == ["a"]
+    assert find(service, filename_glob="*.pdf") == ["a"]
+    assert find(service, uploaded_after=datetime(2026, 1, 3)) == ["d"]
+    assert asyncio.run(service.get_document("c")) is None
+
+
+def test_documents_reload_into_indexes(service):
+    reloaded = DocumentService()
+    assert find(reloaded, content_types=["application/pdf"]) == ["a", "c"]
+    assert find(reloaded, uploaded_after=datetime(2026, 1, 4)) == ["d"]
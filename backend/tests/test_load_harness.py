@@ -0,0 +1,179 @@
+import random
+
+import pytest
+
+from tools.load_test import (
+    DEFAULT_MIX,
+    SOAK_MIX,
+    LatencyHistogram,
+    LoadRunner,
+    check_thresholds,
+    least_squares_slope,
+    parse_args,
+    parse_mix,
+)
+
+
+def make_runner(*argv: str) -> LoadRunner:
+    return LoadRunner(parse_args(list(argv)), app=None, fake=None, seed_ids=[])
+
+
+def make_summary(runner: LoadRunner, error_rate: float = 0.0, p99_ms: float = 100.0) -> dict:
+    return {
+        "total": {"error_rate": error_rate, "p99_ms": p99_ms},
+        "rss_growth_mb_per_hour": runner.rss_growth_mb_per_hour(),
+        "rss_growth_kb_per_1k_requests": runner.rss_growth_kb_per_1k_requests(),
+        "uploaded_documents": runner.uploaded,
+    }
+
+
+def soak_timeline(seconds: int, rps: float, leak_bytes_per_request: float, base_mb: float = 200.0):
+    """Report samples every 5s with RSS that grows by a fixed amount per request plus noise"""
+    rng = random.Random(0)
+    timeline = []
+    for elapsed in range(5, seconds + 1, 5):
+        requests = int(elapsed * rps)
+        rss = base_mb + requests * leak_bytes_per_request / 1024 / 1024 + rng.uniform(-0.2, 0.2)
+        timeline.append({"elapsed_s": float(elapsed), "total_requests": requests, "rss_mb": rss})
+    return timeline
+
+
+# Latency histogram
+
+def test_percentile_ranks():
+    hist = LatencyHistogram()
+    assert hist.percentile(0.5) is None
+    for ms in range(1, 101):
+        hist.record(ms / 1000)
+    assert hist.percentile(0.0) == 1
+    assert hist.percentile(0.50) == 50
+    assert hist.percentile(0.99) == 99
+    assert hist.percentile(1.0) == 100
+
+
+def test_percentile_uses_millisecond_buckets():
+    hist = LatencyHistogram()
+    for seconds in (0.0101, 0.0109, 0.5):
+        hist.record(seconds)
+    assert hist.percentile(0.5) == 10
+    assert hist.percentile(1.0) == 500
+
+
+# Slope
+
+def test_least_squares_slope():
+    assert least_squares_slope([(0, 1), (1, 3), (2, 5), (3, 7)]) == pytest.approx(2.0)
+    assert least_squares_slope([(0, 0), (1, 1)]) is None
+    assert least_squares_slope([(5, 1), (5, 2), (5, 3)]) is None
+
+
+def test_rss_growth_skips_warmup():
+    runner = make_runner("--soak", "--warmup", "20")
+    # Fast growth while warming up, flat afterwards
+    runner.timeline = [
+        {"elapsed_s": float(t), "total_requests": t * 10, "rss_mb": 100.0 + min(t, 20) * 5}
+        for t in range(0, 65, 5)
+    ]
+    assert runner.rss_growth_mb_per_hour() == pytest.approx(0.0)
+    assert runner.rss_growth_kb_per_1k_requests() == pytest.approx(0.0)
+
+    runner.args.warmup = 0
+    assert runner.rss_growth_mb_per_hour() > 0
+
+
+def test_rss_growth_needs_three_points_after_warmup():
+    runner = make_runner("--soak", "--warmup", "10")
+    runner.timeline = [
+        {"elapsed_s": float(t), "total_requests": t, "rss_mb": float(t)} for t in (0, 5, 10, 15)
+    ]
+    assert runner.rss_growth_mb_per_hour() is None
+    assert runner.rss_growth_kb_per_1k_requests() is None
+
+
+def test_rss_growth_per_1k_requests():
+    runner = make_runner("--soak", "--warmup", "0")
+    runner.timeline = soak_timeline(600, rps=10, leak_bytes_per_request=1024)
+    assert runner.rss_growth_kb_per_1k_requests() == pytest.approx(1000, rel=0.05)
+
+
+# Mix parsing
+
+def test_parse_mix():
+    assert parse_mix("upload=1,list=4,chat") == {"upload": 1.0, "list": 4.0, "chat": 1.0}
+    assert parse_mix("list=0,chat=2") == {"list": 0.0, "chat": 2.0}
+
+
+@pytest.mark.parametrize("mix", ["browse=1", "list=0,chat=0", "list=-1,chat=2", "list=many"])
+def test_parse_mix_rejects_bad_mixes(mix):
+    with pytest.raises(ValueError):
+        parse_mix(mix)
+
+
+def test_bad_mix_is_a_usage_error():
+    with pytest.raises(SystemExit):
+        parse_args(["--mix", "list=0"])
+
+
+def test_soak_mix_leaves_out_uploads():
+    assert parse_args([]).mix == DEFAULT_MIX
+    assert parse_args(["--soak"]).mix == SOAK_MIX
+    assert "upload" not in parse_mix(SOAK_MIX)
+    assert parse_args(["--soak", "--mix", "upload=1"]).mix == "upload=1"
+
+
+# Thresholds
+
+def test_error_rate_threshold():
+    runner = make_runner("--max-error-rate", "0.05")
+    assert check_thresholds(runner.args, make_summary(runner, error_rate=0.05)) == []
+    assert len(check_thresholds(runner.args, make_summary(runner, error_rate=0.06))) == 1
+
+
+def test_p99_threshold_only_applies_without_ramp():
+    runner = make_runner("--max-p99-ms", "500")
+    assert check_thresholds(runner.args, make_summary(runner, p99_ms=600)) == ["p99 600ms > 500.0ms"]
+
+    # Ramp runs stop at the SLO instead, so a high overall p99 is expected
+    runner = make_runner("--max-p99-ms", "500", "--ramp-step", "10")
+    assert check_thresholds(runner.args, make_summary(runner, p99_ms=600)) == []
+
+
+def test_rss_thresholds_only_apply_to_soak():
+    runner = make_runner("--warmup", "0")
+    runner.timeline = soak_timeline(600, rps=10, leak_bytes_per_request=10_000)
+    assert check_thresholds(runner.args, make_summary(runner)) == []
+
+
+def test_soak_catches_small_per_request_leak():
+    # One ~800 byte batch job per chat at the soak mix's chat share, at the documented 10 RPS
+    chat_share = parse_mix(SOAK_MIX)["chat"] / sum(parse_mix(SOAK_MIX).values())
+    runner = make_runner("--soak", "--rps", "10", "--warmup", "60")
+    runner.timeline = soak_timeline(3600, rps=10, leak_bytes_per_request=800 * chat_share)
+
+    failures = check_thresholds(runner.args, make_summary(runner))
+    # Well under the per-hour limit, so only the per-request check fires
+    assert runner.rss_growth_mb_per_hour() < runner.args.max_rss_growth
+    assert len(failures) == 1
+    assert "per 1k requests" in failures[0]
+
+
+def test_soak_passes_without_leak():
+    runner = make_runner("--soak", "--rps", "10", "--warmup", "60")
+    runner.timeline = soak_timeline(3600, rps=10, leak_bytes_per_request=0)
+    assert check_thresholds(runner.args, make_summary(runner)) == []
+
+
+def test_soak_failure_mentions_uploads():
+    runner = make_runner("--soak", "--warmup", "0")
+    runner.timeline = soak_timeline(600, rps=10, leak_bytes_per_request=10_000)
+    runner.uploaded = 42
+    failures = check_thresholds(runner.args, make_summary(runner))
+    assert failures and all("42 documents uploaded" in failure for failure in failures)
+
+
+def test_soak_too_short_to_measure_fails():
+    runner = make_runner("--soak")
+    runner.timeline = soak_timeline(240, rps=10, leak_bytes_per_request=0)
+    failures = check_thresholds(runner.args, make_summary(runner))
+    assert len(failures) == 1
+    assert "not enough samples" in failures[0]
@@ -0,0 +1,385 @@
+import asyncio
+import socket
+import time
+
+import openai
+import pytest
+
+from services.resilience import CircuitBreaker, CircuitOpenError, ResilientCaller
+from tools.fake_openai import FakeOpenAIServer, FaultConfig
+
+RETRYABLE_ERRORS = (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)
+
+MESSAGES = [{"role": "user", "content": "hello"}]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture(scope="module")
+def fake_server():
+    with FakeOpenAIServer(port=free_port()) as server:
+        yield server
+
+
+@pytest.fixture
+def fake(fake_server):
+    fake_server.faults = FaultConfig(latency_ms=5, latency_jitter_ms=0)
+    return fake_server
+
+
+def make_caller(**overrides) -> ResilientCaller:
+    options = dict(
+        timeout=1.0,
+        max_retries=3,
+        backoff_base=0.001,
+        retry_on=RETRYABLE_ERRORS,
+        safe_retry_on=(openai.RateLimitError,),
+        breaker=CircuitBreaker(failure_threshold=100),
+    )
+    options.update(overrides)
+    return ResilientCaller(**options)
+
+
+def make_client(fake: FakeOpenAIServer) -> openai.AsyncOpenAI:
+    return openai.AsyncOpenAI(api_key="fake", base_url=fake.base_url, max_retries=0)
+
+
+# Circuit breaker
+
+def test_breaker_opens_after_threshold_and_recovers():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+
+    time.sleep(0.06)
+    assert breaker.allow_request()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Only one trial at a time
+    assert not breaker.allow_request()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow_request()
+
+
+def test_breaker_failed_trial_reopens():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.times_opened == 2
+    assert not breaker.allow_request()
+
+
+def test_cancelled_trial_does_not_wedge_half_open_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    caller = make_caller(breaker=breaker)
+
+    async def slow():
+        await asyncio.sleep(10)
+
+    async def fast():
+        return "ok"
+
+    async def run():
+        trial = asyncio.ensure_future(caller.call(slow))
+        await asyncio.sleep(0.01)
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+        return await caller.call(fast)
+
+    assert asyncio.run(run()) == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_non_retryable_errors_neither_close_nor_count():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=0.05)
+    caller = make_caller(breaker=breaker, max_retries=0)
+
+    async def unavailable():
+        raise asyncio.TimeoutError()
+
+    async def bad_request():
+        raise ValueError("bad request")
+
+    async def run():
+        for _ in range(2):
+            with pytest.raises(asyncio.TimeoutError):
+                await caller.call(unavailable)
+            with pytest.raises(ValueError):
+                await caller.call(bad_request)
+
+    asyncio.run(run())
+    assert breaker.consecutive_failures == 2
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    # A bad request during the half-open trial frees the slot but keeps the breaker half-open
+    breaker.record_failure()
+    time.sleep(0.06)
+    with pytest.raises(ValueError):
+        asyncio.run(caller.call(bad_request))
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow_request()
+
+
+def test_timeout_does_not_wait_for_a_swallowed_cancellation():
+    caller = make_caller(timeout=0.05, max_retries=0)
+    stopped = False
+
+    async def stubborn():
+        nonlocal stopped
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            # Ignore the first cancel, like anyio 3 can
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                stopped = True
+                raise
+
+    async def run():
+        start = time.monotonic()
+        with pytest.raises(asyncio.TimeoutError):
+            await caller.call(stubborn)
+        elapsed = time.monotonic() - start
+        await asyncio.sleep(0.2)
+        return elapsed
+
+    assert asyncio.run(run()) < 0.5
+    assert stopped
+
+
+# Against the fake OpenAI server
+
+def test_successful_call(fake):
+    caller = make_caller()
+
+    async def run():
+        async with make_client(fake) as client:
+            response = await caller.call(client.chat.completions.create, model="gpt", messages=MESSAGES)
+            return response.choices[0].message.content
+
+    assert asyncio.run(run()).startswith("Fake answer")
+    assert caller.metrics()["successes"] == 1
+
+
+def test_retries_until_exhausted(fake):
+    fake.faults = FaultConfig(latency_ms=1, latency_jitter_ms=0, error_rate=1.0, error_statuses=[503])
+    caller = make_caller(max_retries=2)
+
+    async def run():
+        async with make_client(fake) as client:
+            with pytest.raises(openai.InternalServerError):
+                await caller.call(client.chat.completions.create, model="gpt", messages=MESSAGES)
+
+    asyncio.run(run())
+    metrics = caller.metrics()
+    assert metrics["attempts"] == 3
+    assert metrics["retries"] == 2
+    assert metrics["failures"] == 1
+
+
+def test_retries_recover_from_transient_errors(fake):
+    fake.faults = FaultConfig(latency_ms=1, latency_jitter_ms=0, error_rate=0.5, error_statuses=[500, 429])
+    caller = make_caller(max_retries=10)
+
+    async def run():
+        async with make_client(fake) as client:
+            for _ in range(10):
+                await caller.call(client.chat.completions.create, model="gpt", messages=MESSAGES)
+
+    asyncio.run(run())
+    assert caller.metrics()["successes"] == 10
+
+
+def test_non_idempotent_calls_only_retry_safe_errors(fake):
+    fake.faults = FaultConfig(latency_ms=1, latency_jitter_ms=0, error_rate=1.0, error_statuses=[500])
+    caller = make_caller()
+
+    async def create_batch(client):
+        return await caller.call(
+            client.batches.create,
+            idempotent=False,
+            input_file_id="file-1",
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+
+    async def run():
+        async with make_client(fake) as client:
+            with pytest.raises(openai.InternalServerError):
+                await create_batch(client)
+            assert caller.metrics()["attempts"] == 1
+
+            fake.faults = FaultConfig(latency_ms=1, latency_jitter_ms=0, error_rate=1.0, error_statuses=[429])
+            with pytest.raises(openai.RateLimitError):
+                await create_batch(client)
+            assert caller.metrics()["attempts"] == 1 + 4
+
+    asyncio.run(run())
+
+
+def test_non_idempotent_calls_not_retried_after_timeout(fake):
+    fake.faults = FaultConfig(latency_ms=1, latency_jitter_ms=0, hang_rate=1.0, hang_seconds=2)
+    caller = make_caller(timeout=0.2)
+
+    async def run():
+        async with make_client(fake) as client:
+            with pytest.raises(asyncio.TimeoutError):
+                await caller.call(
+                    client.files.create, idempotent=False, file=("input.jsonl", b"{}"), purpose="batch"
+                )
+
+    asyncio.run(run())
+    assert caller.metrics()["attempts"] == 1
+    assert caller.metrics()["timeouts"] == 1
+
+
+def test_timeouts_cancel_requests_and_free_capacity(fake):
+    fake.faults = FaultConfig(latency_ms=1, latency_jitter_ms=0, hang_rate=1.0, hang_seconds=5)
+    caller = make_caller(timeout=0.2, max_retries=1, breaker=CircuitBreaker(failure_threshold=1000))
+
+    async def run():
+        async with make_client(fake) as client:
+            hung = [
+                caller.call(client.chat.completions.create, model="gpt", messages=MESSAGES)
+                for _ in range(50)
+            ]
+            results = await asyncio.gather(*hung, return_exceptions=True)
+            assert all(isinstance(r, asyncio.TimeoutError) for r in results)
+
+            # Nothing is left holding a worker: a healthy call goes straight through
+            fake.faults = FaultConfig(latency_ms=1, latency_jitter_ms=0)
+            start = time.monotonic()
+            await caller.call(client.chat.completions.create, model="gpt", messages=MESSAGES)
+            return time.monotonic() - start
+
+    assert asyncio.run(run()) < 0.2
+    assert caller.metrics()["timeouts"] == 100
+
+
+def test_breaker_fails_fast_when_upstream_is_down(fake):
+    fake.faults = FaultConfig(latency_ms=1, latency_jitter_ms=0, error_rate=1.0, error_statuses=[503])
+    caller = make_caller(max_retries=0, breaker=CircuitBreaker(failure_threshold=3, reset_timeout=0.2))
+
+    async def call(client):
+        return await caller.call(client.chat.completions.create, model="gpt", messages=MESSAGES)
+
+    async def run():
+        async with make_client(fake) as client:
+            for _ in range(3):
+                with pytest.raises(openai.InternalServerError):
+                    await call(client)
+            requests_before = fake.app.state.stats["requests"]
+            with pytest.raises(CircuitOpenError):
+                await call(client)
+            assert fake.app.state.stats["requests"] == requests_before
+
+            fake.faults = FaultConfig(latency_ms=1, latency_jitter_ms=0)
+            await asyncio.sleep(0.25)
+            await call(client)
+
+    asyncio.run(run())
+    metrics = caller.metrics()
+    assert metrics["short_circuited"] == 1
+    assert metrics["circuit"]["state"] == CircuitBreaker.CLOSED
+
+
+def test_hedging_cuts_tail_latency(fake):
+    caller = make_caller(timeout=2.0, hedge_min_samples=10, hedge_budget=1.0)
+
+    async def run():
+        async with make_client(fake) as client:
+            # Enough samples that a few slow calls don't move the p95 hedge delay
+            for _ in range(100):
+                await caller.call(client.chat.completions.create, hedge=True, model="gpt", messages=MESSAGES)
+
+            fake.faults = FaultConfig(latency_ms=5, latency_jitter_ms=0, hang_rate=0.3, hang_seconds=1.5)
+            hangs_before = fake.app.state.stats["hangs_injected"]
+            start = time.monotonic()
+            for _ in range(20):
+                await caller.call(client.chat.completions.create, hedge=True, model="gpt", messages=MESSAGES)
+            return time.monotonic() - start, fake.app.state.stats["hangs_injected"] - hangs_before
+
+    elapsed, hangs = asyncio.run(run())
+    metrics = caller.metrics()
+    assert metrics["hedges"] > 0
+    assert metrics["hedge_wins"] > 0
+    assert metrics["timeouts"] == 0
+    # Unhedged, every hang costs 1.5s; hedged, only calls where both attempts hang do
+    assert elapsed < 0.5 + 0.75 * 1.5 * hangs
+
+
+def test_hedge_budget_and_per_operation_latency():
+    caller = make_caller(hedge_min_samples=5, hedge_budget=0.1)
+
+    async def fast():
+        return "fast"
+
+    async def slow():
+        await asyncio.sleep(0.02)
+        return "slow"
+
+    async def run():
+        # Fast polls must not lower the hedge delay of the slow operation
+        for _ in range(20):
+            await caller.call(fast, operation="poll", hedge=True)
+        for _ in range(20):
+            await caller.call(slow, operation="chat", hedge=True)
+
+    asyncio.run(run())
+    metrics = caller.metrics()
+    assert set(metrics["operations"]) == {"poll", "chat"}
+    assert metrics["operations"]["chat"]["hedge_delay_ms"] >= 15
+    assert metrics["hedges"] <= 0.1 * metrics["calls"]
+
+
+def test_hedge_delay_only_reported_for_hedged_operations():
+    caller = make_caller(hedge_min_samples=5)
+
+    async def op():
+        return "ok"
+
+    async def run():
+        for _ in range(10):
+            await caller.call(op, operation="read", hedge=True)
+            await caller.call(op, operation="create", hedge=True, idempotent=False)
+            await caller.call(op, operation="plain")
+
+    asyncio.run(run())
+    operations = caller.metrics()["operations"]
+    assert operations["read"]["hedge_delay_ms"] is not None
+    assert operations["create"]["hedge_delay_ms"] is None
+    assert operations["plain"]["hedge_delay_ms"] is None
+    assert operations["create"]["samples"] == 10
+
+
+def test_hedge_budget_caps_backup_requests():
+    caller = make_caller(hedge_min_samples=5, hedge_budget=0.05)
+    calls = 0
+
+    async def sometimes_slow():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05 if calls > 10 else 0.001)
+
+    async def run():
+        for _ in range(60):
+            await caller.call(sometimes_slow, operation="op", hedge=True)
+
+    asyncio.run(run())
+    metrics = caller.metrics()
+    assert 0 < metrics["hedges"] <= 0.05 * metrics["calls"]
@@ -0,0 +1,2 @@
+
+# Tools package initialization
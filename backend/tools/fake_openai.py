@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Local fake OpenAI server with fault injection.
+
+Implements the chat completions, files and batches endpoints used by
+OpenAIService, with tunable latency, error rate and hangs so retries,
+hedging and the circuit breaker can be exercised without the real API.
+
+Run it and point the backend at it:
+
+    python -m tools.fake_openai --port 9000 --error-rate 0.2
+    OPENAI_BASE_URL=http://127.0.0.1:9000/v1 OPENAI_API_KEY=fake python run.py
+"""
+
+import argparse
+import asyncio
+import random
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, File, Form, Request, UploadFile
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from pydantic import BaseModel
+from starlette.requests import ClientDisconnect
+
+# Keep at most this many files and batches so long soak runs stay bounded
+MAX_STORED_OBJECTS = 1000
+
+
+class FaultConfig(BaseModel):
+    latency_ms: float = 50.0
+    latency_jitter_ms: float = 25.0
+    error_rate: float = 0.0
+    error_statuses: List[int] = [500, 502, 503, 429]
+    hang_rate: float = 0.0
+    hang_seconds: float = 60.0
+    batch_completion_seconds: float = 0.0
+
+
+def _store(store: Dict[str, Any], key: str, value: Any):
+    """Insert into a store, evicting the oldest entries past the limit"""
+    store[key] = value
+    while len(store) > MAX_STORED_OBJECTS:
+        del store[next(iter(store))]
+
+
+def create_app(faults: Optional[FaultConfig] = None) -> FastAPI:
+    """Create the fake OpenAI application"""
+    app = FastAPI(title="Fake OpenAI API")
+    app.state.faults = faults or FaultConfig()
+    app.state.stats = {"requests": 0, "errors_injected": 0, "hangs_injected": 0}
+    files: Dict[str, Dict[str, Any]] = {}
+    file_contents: Dict[str, str] = {}
+    batches: Dict[str, Dict[str, Any]] = {}
+
+    @app.exception_handler(ClientDisconnect)
+    async def client_disconnected(request: Request, exc: ClientDisconnect):
+        # Timed-out and losing hedged attempts are cancelled mid-request; nothing to report
+        return Response(status_code=499)
+
+    async def inject_faults() -> Optional[JSONResponse]:
+        """Apply latency, hangs and errors; return an error response if one is injected"""
+        faults: FaultConfig = app.state.faults
+        app.state.stats["requests"] += 1
+
+        latency = max(0.0, faults.latency_ms + random.uniform(-1, 1) * faults.latency_jitter_ms)
+        await asyncio.sleep(latency / 1000)
+
+        if random.random() < faults.hang_rate:
+            app.state.stats["hangs_injected"] += 1
+            await asyncio.sleep(faults.hang_seconds)
+
+        if random.random() < faults.error_rate:
+            app.state.stats["errors_injected"] += 1
+            status = random.choice(faults.error_statuses)
+            return JSONResponse(
+                status_code=status,
+                content={"error": {"message": "Injected fault", "type": "server_error", "code": None}}
+            )
+        return None
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        if (error := await inject_faults()) is not None:
+            return error
+        question = body["messages"][-1]["content"]
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake-model"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": f"Fake answer ({len(question)} chars of context)"},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": len(question) // 4, "completion_tokens": 8, "total_tokens": len(question) // 4 + 8}
+        }
+
+    @app.post("/v1/files")
+    async def create_file(file: UploadFile = File(...), purpose: str = Form(...)):
+        content = await file.read()
+        if (error := await inject_faults()) is not None:
+            return error
+        file_id = f"file-{uuid.uuid4().hex}"
+        _store(files, file_id, {
+            "id": file_id,
+            "object": "file",
+            "bytes": len(content),
+            "created_at": int(time.time()),
+            "filename": file.filename,
+            "purpose": purpose,
+            "status": "processed"
+        })
+        _store(file_contents, file_id, content.decode("utf-8", errors="replace"))
+        return files[file_id]
+
+    @app.get("/v1/files/{file_id}/content")
+    async def get_file_content(file_id: str):
+        if (error := await inject_faults()) is not None:
+            return error
+        if file_id not in file_contents:
+            return JSONResponse(status_code=404, content={"error": {"message": "No such file", "type": "invalid_request_error"}})
+        return PlainTextResponse(file_contents[file_id])
+
+    @app.post("/v1/batches")
+    async def create_batch(request: Request):
+        body = await request.json()
+        if (error := await inject_faults()) is not None:
+            return error
+        batch_id = f"batch_{uuid.uuid4().hex}"
+        _store(batches, batch_id, {
+            "id": batch_id,
+            "object": "batch",
+            "endpoint": body["endpoint"],
+            "input_file_id": body["input_file_id"],
+            "completion_window": body["completion_window"],
+            "status": "in_progress",
+            "output_file_id": None,
+            "created_at": int(time.time())
+        })
+        return batches[batch_id]
+
+    @app.get("/v1/batches/{batch_id}")
+    async def retrieve_batch(batch_id: str):
+        if (error := await inject_faults()) is not None:
+            return error
+        batch = batches.get(batch_id)
+        if batch is None:
+            return JSONResponse(status_code=404, content={"error": {"message": "No such batch", "type": "invalid_request_error"}})
+
+        elapsed = time.time() - batch["created_at"]
+        if batch["status"] == "in_progress" and elapsed >= app.state.faults.batch_completion_seconds:
+            output_id = f"file-{uuid.uuid4().hex}"
+            _store(file_contents, output_id, file_contents.get(batch["input_file_id"], ""))
+            batch["status"] = "completed"
+            batch["output_file_id"] = output_id
+        return batch
+
+    @app.get("/_faults")
+    async def get_faults():
+        return app.state.faults
+
+    @app.post("/_faults")
+    async def set_faults(faults: FaultConfig):
+        app.state.faults = faults
+        return faults
+
+    @app.get("/_stats")
+    async def get_stats():
+        return {**app.state.stats, "files": len(files), "batches": len(batches)}
+
+    return app
+
+
+class FakeOpenAIServer:
+    """Run the fake OpenAI app in a background thread"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 9000, faults: Optional[FaultConfig] = None):
+        self.host = host
+        self.port = port
+        self.app = create_app(faults)
+        self._server = uvicorn.Server(uvicorn.Config(self.app, host=host, port=port, log_level="warning"))
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    @property
+    def faults(self) -> FaultConfig:
+        return self.app.state.faults
+
+    @faults.setter
+    def faults(self, value: FaultConfig):
+        self.app.state.faults = value
+
+    def start(self, timeout: float = 10.0):
+        """Start the server and wait until it accepts connections"""
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + timeout
+        while not self._server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("Fake OpenAI server did not start")
+            time.sleep(0.05)
+
+    def stop(self):
+        """Stop the server"""
+        self._server.should_exit = True
+        if self._thread:
+            self._thread.join(timeout=10)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI server with fault injection")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--latency-jitter-ms", type=float, default=25.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--hang-rate", type=float, default=0.0)
+    parser.add_argument("--hang-seconds", type=float, default=60.0)
+    args = parser.parse_args()
+
+    faults = FaultConfig(
+        latency_ms=args.latency_ms,
+        latency_jitter_ms=args.latency_jitter_ms,
+        error_rate=args.error_rate,
+        hang_rate=args.hang_rate,
+        hang_seconds=args.hang_seconds
+    )
+    uvicorn.run(create_app(faults), host=args.host, port=args.port, log_level="info")
+
+
+if __name__ == "__main__":
+    main()
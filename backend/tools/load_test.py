@@ -0,0 +1,602 @@
+#!/usr/bin/env python3
+"""
+Load and soak test harness for the Document Chatbot API.
+
+Starts `main:app` under uvicorn with a configurable worker count, pointed at
+an in-process fake OpenAI server, then drives a mixed workload of uploads,
+listings, scoped chats ("searches") and full chats at a target RPS. Every
+report interval it prints achieved RPS, p50/p95/p99 latency, error rate and
+the app's RSS.
+
+Examples:
+
+    # 60s at 20 RPS with 2 workers
+    python -m tools.load_test --workers 2 --rps 20 --duration 60
+
+    # Step the rate up until p99 or errors break the SLO
+    python -m tools.load_test --rps 10 --ramp-step 10 --ramp-every 30 --max-rps 300 --max-p99-ms 2000
+
+    # One hour soak without uploads, fail on RSS growth per hour or per 1k requests
+    python -m tools.load_test --soak --rps 10 --duration 3600
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from tools.fake_openai import FakeOpenAIServer, FaultConfig
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+DEFAULT_MIX = "upload=1,list=4,search=3,chat=2"
+
+# Uploads grow the document store on purpose, which would hide a leak in the RSS slope
+SOAK_MIX = "list=4,search=3,chat=2"
+
+# Allowed RSS growth per 1000 requests in soak mode. A leak of 800 bytes per
+# chat (one unevicted batch job) adds about 180 KB per 1k requests of SOAK_MIX;
+# a leak-free app settles well under 50 KB once warmed up
+MAX_RSS_GROWTH_PER_1K = 100.0
+
+# Operations answered by the chat endpoint, which falls back to a 200 with no sources
+CHAT_OPERATIONS = {"search", "chat"}
+
+SEED_PREFIXES = ["contract", "report", "invoice", "memo"]
+
+
+class LatencyHistogram:
+    """Latency histogram with 1ms buckets, so memory stays bounded on long runs"""
+
+    def __init__(self):
+        self.buckets: Counter = Counter()
+        self.count = 0
+
+    def record(self, seconds: float):
+        self.buckets[int(seconds * 1000)] += 1
+        self.count += 1
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Get the latency in ms at quantile q"""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for ms in sorted(self.buckets):
+            seen += self.buckets[ms]
+            if seen > rank:
+                return float(ms)
+        return float(max(self.buckets))
+
+
+class OpStats:
+    """Request counts, errors and latencies for one window or a whole run"""
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.per_op: Dict[str, LatencyHistogram] = {}
+        self.errors: Counter = Counter()
+        self.requests = 0
+        self.dropped = 0
+
+    def record(self, op: str, seconds: float, error: Optional[str] = None):
+        self.requests += 1
+        self.latency.record(seconds)
+        self.per_op.setdefault(op, LatencyHistogram()).record(seconds)
+        if error:
+            self.errors[f"{op}:{error}"] += 1
+
+    @property
+    def error_count(self) -> int:
+        return sum(self.errors.values())
+
+    @property
+    def error_rate(self) -> float:
+        return self.error_count / self.requests if self.requests else 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "dropped": self.dropped,
+            "error_rate": round(self.error_rate, 4),
+            "p50_ms": self.latency.percentile(0.50),
+            "p95_ms": self.latency.percentile(0.95),
+            "p99_ms": self.latency.percentile(0.99),
+        }
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    """Parse a workload mix like 'upload=1,list=4,search=3,chat=2'"""
+    weights = {}
+    for part in mix.split(","):
+        op, _, weight = part.partition("=")
+        if op not in OPERATIONS:
+            raise ValueError(f"Unknown operation in mix: {op}")
+        try:
+            weights[op] = float(weight or 1)
+        except ValueError:
+            raise ValueError(f"Invalid weight for {op}: {weight}")
+        if weights[op] < 0:
+            raise ValueError(f"Negative weight for {op}: {weight}")
+    if not any(weights.values()):
+        raise ValueError("Mix needs at least one operation with a positive weight")
+    return weights
+
+
+def least_squares_slope(points: List[Tuple[float, float]]) -> Optional[float]:
+    """Slope of the least-squares line through (x, y) points, None if it can't be fitted"""
+    if len(points) < 3:
+        return None
+    n = len(points)
+    mean_x = sum(x for x, _ in points) / n
+    mean_y = sum(y for _, y in points) / n
+    var_x = sum((x - mean_x) ** 2 for x, _ in points)
+    if not var_x:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / var_x
+
+
+def seed_workdir(workdir: Path, count: int) -> List[str]:
+    """
+    Write seed documents to the app's storage before it starts.
+
+    Workers don't share memory and only load documents.json at startup, so
+    seeding before they boot makes the same documents visible to all of them.
+    """
+    uploads_dir = workdir / "uploads"
+    storage_dir = workdir / "backend" / "storage"
+    uploads_dir.mkdir(parents=True, exist_ok=True)
+    storage_dir.mkdir(parents=True, exist_ok=True)
+
+    documents = []
+    now = datetime.now()
+    for i in range(count):
+        doc_id = str(uuid.uuid4())
+        filename = f"{SEED_PREFIXES[i % len(SEED_PREFIXES)]}_{i:03d}.txt"
+        text = f"Seed document {i}. " + "Lorem ipsum dolor sit amet. " * 100
+        file_path = uploads_dir / f"{doc_id}.txt"
+        file_path.write_text(text)
+        documents.append({
+            "id": doc_id,
+            "filename": filename,
+            "original_filename": filename,
+            "file_path": str(file_path),
+            "content_type": "text/plain",
+            "size": len(text),
+            "upload_date": (now - timedelta(days=count - i)).isoformat(),
+            "text_content": text
+        })
+
+    (storage_dir / "documents.json").write_text(json.dumps(documents, indent=2))
+    return [doc["id"] for doc in documents]
+
+
+def read_rss_kb(pid: int) -> int:
+    """Read a process's resident set size from /proc (Linux only)"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return 0
+
+
+def descendant_pids(root_pid: int) -> List[int]:
+    """Find a process and all of its descendants by scanning /proc"""
+    parents: Dict[int, List[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces, so split after its closing paren
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        parents.setdefault(ppid, []).append(int(entry))
+
+    pids = [root_pid]
+    for pid in pids:
+        pids.extend(parents.get(pid, []))
+    return pids
+
+
+class AppProcess:
+    """Run main:app under uvicorn in a subprocess"""
+
+    def __init__(self, workdir: Path, host: str, port: int, workers: int, env: Dict[str, str]):
+        self.workdir = workdir
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.env = env
+        self.process: Optional[subprocess.Popen] = None
+        self.log_file = workdir / "app.log"
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        command = [
+            sys.executable, "-m", "uvicorn", "main:app",
+            "--app-dir", str(BACKEND_DIR),
+            "--host", self.host,
+            "--port", str(self.port),
+            "--workers", str(self.workers),
+            "--log-level", "warning"
+        ]
+        with open(self.log_file, "wb") as log:
+            self.process = subprocess.Popen(
+                command, cwd=self.workdir, env={**os.environ, **self.env}, stdout=log, stderr=subprocess.STDOUT
+            )
+
+    async def wait_ready(self, timeout: float = 30.0):
+        """Poll the health endpoint until the app answers"""
+        deadline = time.monotonic() + timeout
+        async with httpx.AsyncClient(base_url=self.base_url) as client:
+            while time.monotonic() < deadline:
+                if self.process.poll() is not None:
+                    raise RuntimeError(f"App exited with code {self.process.returncode}, see {self.log_file}")
+                try:
+                    response = await client.get("/api/v1/health")
+                    if response.status_code == 200:
+                        return
+                except httpx.TransportError:
+                    pass
+                await asyncio.sleep(0.2)
+        raise RuntimeError("App did not become ready in time")
+
+    def rss_mb(self) -> float:
+        """Get the combined RSS of the uvicorn process and its workers"""
+        if self.process is None or not Path("/proc").exists():
+            return 0.0
+        return sum(read_rss_kb(pid) for pid in descendant_pids(self.process.pid)) / 1024
+
+    def stop(self):
+        if self.process is None or self.process.poll() is not None:
+            return
+        self.process.send_signal(signal.SIGINT)
+        try:
+            self.process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+async def op_upload(client: httpx.AsyncClient, seed_ids: List[str]) -> httpx.Response:
+    text = f"Uploaded during load test at {time.time()}. " * 50
+    files = {"files": (f"load_{uuid.uuid4().hex[:8]}.txt", text.encode(), "text/plain")}
+    return await client.post("/api/v1/documents/upload", files=files)
+
+
+async def op_list(client: httpx.AsyncClient, seed_ids: List[str]) -> httpx.Response:
+    return await client.get("/api/v1/documents")
+
+
+async def op_search(client: httpx.AsyncClient, seed_ids: List[str]) -> httpx.Response:
+    # Scoped chats resolve filters through the document indexes
+    if random.random() < 0.5:
+        scope = {"document_ids": random.sample(seed_ids, min(len(seed_ids), random.randint(1, 3)))}
+    else:
+        scope = {"filename_glob": f"{random.choice(SEED_PREFIXES)}_00*.txt", "content_types": ["text/plain"]}
+    return await client.post("/api/v1/chat", json={"message": "What is this document about?", **scope})
+
+
+async def op_chat(client: httpx.AsyncClient, seed_ids: List[str]) -> httpx.Response:
+    return await client.post("/api/v1/chat", json={"message": "Summarise all documents."})
+
+
+OPERATIONS = {
+    "upload": op_upload,
+    "list": op_list,
+    "search": op_search,
+    "chat": op_chat,
+}
+
+
+class LoadRunner:
+    """Drive an open-loop workload against the app and collect stats"""
+
+    def __init__(self, args: argparse.Namespace, app: AppProcess, fake: FakeOpenAIServer, seed_ids: List[str]):
+        self.args = args
+        self.app = app
+        self.fake = fake
+        self.seed_ids = seed_ids
+        self.mix = parse_mix(args.mix)
+        self.total = OpStats()
+        self.window = OpStats()
+        self.timeline: List[Dict[str, Any]] = []
+        self.rps = args.rps
+        self.ceiling: Optional[float] = None
+        self.uploaded = 0
+
+    async def _run_op(self, client: httpx.AsyncClient, op: str):
+        start = time.monotonic()
+        error = None
+        try:
+            response = await OPERATIONS[op](client, self.seed_ids)
+            if response.status_code >= 400:
+                error = str(response.status_code)
+            elif op in CHAT_OPERATIONS and not response.json().get("sources"):
+                # Upstream failures come back as an apology without sources
+                error = "fallback"
+            elif op == "upload":
+                self.uploaded += 1
+        except httpx.HTTPError as e:
+            error = type(e).__name__
+        except ValueError:
+            error = "invalid_json"
+        elapsed = time.monotonic() - start
+        self.total.record(op, elapsed, error)
+        self.window.record(op, elapsed, error)
+
+    def _report(self, elapsed: float, interval: float) -> Dict[str, Any]:
+        sample = {
+            "elapsed_s": round(elapsed, 1),
+            "target_rps": self.rps,
+            "achieved_rps": round(self.window.requests / interval, 1),
+            **self.window.summary(),
+            "total_requests": self.total.requests,
+            "rss_mb": round(self.app.rss_mb(), 3),
+        }
+        self.timeline.append(sample)
+        print(
+            f"[{sample['elapsed_s']:>7.1f}s] rps {sample['achieved_rps']:>6.1f}/{self.rps:<6g} "
+            f"p50 {sample['p50_ms']}ms p95 {sample['p95_ms']}ms p99 {sample['p99_ms']}ms "
+            f"err {sample['error_rate']:.2%} dropped {sample['dropped']} rss {sample['rss_mb']:.1f}MB"
+        )
+        return sample
+
+    def _breaks_slo(self, sample: Dict[str, Any]) -> bool:
+        if sample["error_rate"] > self.args.max_error_rate or sample["dropped"]:
+            return True
+        return self.args.max_p99_ms is not None and (sample["p99_ms"] or 0) > self.args.max_p99_ms
+
+    async def run(self):
+        ops = list(self.mix)
+        weights = [self.mix[op] for op in ops]
+        limits = httpx.Limits(max_connections=self.args.max_in_flight)
+        timeout = httpx.Timeout(self.args.request_timeout)
+        in_flight = set()
+
+        async with httpx.AsyncClient(base_url=self.app.base_url, limits=limits, timeout=timeout) as client:
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            next_send = start
+            next_report = start + self.args.report_every
+            next_ramp = start + self.args.ramp_every if self.args.ramp_step else None
+
+            while loop.time() - start < self.args.duration:
+                if len(in_flight) < self.args.max_in_flight:
+                    op = random.choices(ops, weights)[0]
+                    task = asyncio.create_task(self._run_op(client, op))
+                    in_flight.add(task)
+                    task.add_done_callback(in_flight.discard)
+                else:
+                    # Client-side saturation: the app can't keep up with the target rate
+                    self.total.dropped += 1
+                    self.window.dropped += 1
+
+                now = loop.time()
+                if now >= next_report:
+                    sample = self._report(now - start, self.args.report_every)
+                    self.window = OpStats()
+                    next_report += self.args.report_every
+                    if next_ramp is not None and now >= next_ramp:
+                        if self._breaks_slo(sample):
+                            print(f"SLO broken at {self.rps:g} RPS")
+                            break
+                        self.ceiling = self.rps
+                        if self.rps >= self.args.max_rps:
+                            break
+                        self.rps = min(self.args.max_rps, self.rps + self.args.ramp_step)
+                        next_ramp += self.args.ramp_every
+
+                next_send += 1 / self.rps
+                await asyncio.sleep(max(0.0, next_send - loop.time()))
+
+            if in_flight:
+                await asyncio.wait(in_flight, timeout=self.args.request_timeout)
+
+    def _after_warmup(self) -> List[Dict[str, Any]]:
+        return [s for s in self.timeline if s["elapsed_s"] >= self.args.warmup]
+
+    def rss_growth_mb_per_hour(self) -> Optional[float]:
+        """Least-squares slope of RSS over time, skipping the warmup"""
+        slope = least_squares_slope([(s["elapsed_s"], s["rss_mb"]) for s in self._after_warmup()])
+        return slope * 3600 if slope is not None else None
+
+    def rss_growth_kb_per_1k_requests(self) -> Optional[float]:
+        """
+        Least-squares slope of RSS over completed requests, skipping the warmup.
+
+        Unlike growth per hour this doesn't shrink with the request rate, so a
+        leak of a few hundred bytes per request shows up at any RPS.
+        """
+        slope = least_squares_slope([(s["total_requests"], s["rss_mb"]) for s in self._after_warmup()])
+        return slope * 1024 * 1000 if slope is not None else None
+
+    def summary(self) -> Dict[str, Any]:
+        upstream = {}
+        try:
+            upstream = httpx.get(f"{self.app.base_url}/api/v1/chat/upstream-metrics", timeout=5).json()
+        except (httpx.HTTPError, ValueError):
+            pass
+        if upstream and self.args.workers > 1:
+            # Each worker keeps its own counters and the request lands on just one of them
+            upstream = {"note": f"from one of {self.args.workers} workers", **upstream}
+        return {
+            "workers": self.args.workers,
+            "mix": self.mix,
+            "total": self.total.summary(),
+            "per_op": {
+                op: {
+                    "requests": hist.count,
+                    "p50_ms": hist.percentile(0.50),
+                    "p95_ms": hist.percentile(0.95),
+                    "p99_ms": hist.percentile(0.99),
+                }
+                for op, hist in sorted(self.total.per_op.items())
+            },
+            "errors": dict(self.total.errors.most_common(10)),
+            "rss_growth_mb_per_hour": self.rss_growth_mb_per_hour(),
+            "rss_growth_kb_per_1k_requests": self.rss_growth_kb_per_1k_requests(),
+            "uploaded_documents": self.uploaded,
+            "ceiling_rps": self.ceiling,
+            "upstream": upstream,
+            "fake_openai": {**self.fake.app.state.stats},
+            "timeline": self.timeline,
+        }
+
+
+def check_thresholds(args: argparse.Namespace, summary: Dict[str, Any]) -> List[str]:
+    """Get the list of violated pass/fail thresholds"""
+    failures = []
+    total = summary["total"]
+    if total["error_rate"] > args.max_error_rate:
+        failures.append(f"error rate {total['error_rate']:.2%} > {args.max_error_rate:.2%}")
+    if args.max_p99_ms is not None and not args.ramp_step and (total["p99_ms"] or 0) > args.max_p99_ms:
+        failures.append(f"p99 {total['p99_ms']}ms > {args.max_p99_ms}ms")
+    if args.soak:
+        growth = summary["rss_growth_mb_per_hour"]
+        per_request = summary["rss_growth_kb_per_1k_requests"]
+        uploads = summary["uploaded_documents"]
+        # Stored uploads grow memory on purpose, so say how many there were
+        note = f" ({uploads} documents uploaded during the run)" if uploads else ""
+        if growth is None or per_request is None:
+            failures.append(f"not enough samples after the {args.warmup:g}s warmup to measure RSS growth")
+        else:
+            if growth > args.max_rss_growth:
+                failures.append(f"RSS growing {growth:.1f} MB/hour > {args.max_rss_growth} MB/hour{note}")
+            if per_request > args.max_rss_growth_per_1k:
+                failures.append(
+                    f"RSS growing {per_request:.1f} KB per 1k requests > {args.max_rss_growth_per_1k} KB{note}"
+                )
+    return failures
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load and soak test the Document Chatbot API")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100, help="port for the app under test")
+    parser.add_argument("--fake-port", type=int, default=9100, help="port for the fake OpenAI server")
+    parser.add_argument("--rps", type=float, default=10.0, help="target requests per second")
+    parser.add_argument("--duration", type=float, default=60.0, help="run length in seconds")
+    parser.add_argument(
+        "--mix", default=None,
+        help=f"operation weights (default: {DEFAULT_MIX}, or {SOAK_MIX} with --soak)"
+    )
+    parser.add_argument("--seed-documents", type=int, default=20)
+    parser.add_argument("--max-in-flight", type=int, default=200)
+    parser.add_argument("--request-timeout", type=float, default=60.0)
+    parser.add_argument("--report-every", type=float, default=5.0, help="seconds between report lines")
+
+    ramp = parser.add_argument_group("ramp (find the ceiling)")
+    ramp.add_argument("--ramp-step", type=float, default=0.0, help="RPS added every --ramp-every seconds")
+    ramp.add_argument("--ramp-every", type=float, default=30.0)
+    ramp.add_argument("--max-rps", type=float, default=500.0)
+
+    soak = parser.add_argument_group("soak")
+    soak.add_argument("--soak", action="store_true", help="check RSS growth over the run")
+    soak.add_argument(
+        "--warmup", type=float, default=300.0,
+        help="seconds ignored by the RSS growth check, while allocator arenas and caches settle"
+    )
+    soak.add_argument("--max-rss-growth", type=float, default=25.0, help="allowed RSS growth in MB/hour")
+    soak.add_argument(
+        "--max-rss-growth-per-1k", type=float, default=MAX_RSS_GROWTH_PER_1K,
+        help="allowed RSS growth in KB per 1000 requests"
+    )
+
+    thresholds = parser.add_argument_group("thresholds")
+    thresholds.add_argument("--max-error-rate", type=float, default=0.01)
+    thresholds.add_argument("--max-p99-ms", type=float, default=None)
+
+    faults = parser.add_argument_group("fake OpenAI faults")
+    faults.add_argument("--openai-latency-ms", type=float, default=300.0)
+    faults.add_argument("--openai-latency-jitter-ms", type=float, default=150.0)
+    faults.add_argument("--openai-error-rate", type=float, default=0.0)
+    faults.add_argument("--openai-hang-rate", type=float, default=0.0)
+    faults.add_argument("--openai-hang-seconds", type=float, default=60.0)
+
+    parser.add_argument(
+        "--workdir", type=Path, default=None,
+        help="keep the run's files in a new subdirectory of this directory (default: a temp dir)"
+    )
+    parser.add_argument("--json", type=Path, default=None, help="write the full report to this file")
+    args = parser.parse_args(argv)
+    if args.mix is None:
+        args.mix = SOAK_MIX if args.soak else DEFAULT_MIX
+    try:
+        parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+    return args
+
+
+async def run(args: argparse.Namespace) -> int:
+    faults = FaultConfig(
+        latency_ms=args.openai_latency_ms,
+        latency_jitter_ms=args.openai_latency_jitter_ms,
+        error_rate=args.openai_error_rate,
+        hang_rate=args.openai_hang_rate,
+        hang_seconds=args.openai_hang_seconds
+    )
+
+    with tempfile.TemporaryDirectory(prefix="loadtest_") as tmp:
+        workdir = Path(tmp)
+        if args.workdir:
+            # Never reuse a directory: seeding overwrites the app's documents.json
+            workdir = args.workdir / f"loadtest_{datetime.now():%Y%m%d_%H%M%S}_{uuid.uuid4().hex[:6]}"
+            workdir.mkdir(parents=True)
+            print(f"Working directory: {workdir}")
+        seed_ids = seed_workdir(workdir, args.seed_documents)
+
+        with FakeOpenAIServer(host=args.host, port=args.fake_port, faults=faults) as fake:
+            app = AppProcess(workdir, args.host, args.port, args.workers, env={
+                "OPENAI_API_KEY": "fake",
+                "OPENAI_BASE_URL": fake.base_url,
+            })
+            app.start()
+            try:
+                await app.wait_ready()
+                print(f"App ready with {args.workers} worker(s), RSS {app.rss_mb():.1f}MB")
+                runner = LoadRunner(args, app, fake, seed_ids)
+                await runner.run()
+                summary = runner.summary()
+            finally:
+                app.stop()
+
+    print(json.dumps({k: v for k, v in summary.items() if k != "timeline"}, indent=2))
+    if args.json:
+        args.json.write_text(json.dumps(summary, indent=2))
+
+    failures = check_thresholds(args, summary)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+def main():
+    sys.exit(asyncio.run(run(parse_args())))
+
+
+if __name__ == "__main__":
+    main()